@@ -1,5 +1,5 @@
 from fastapi import FastAPI, Request, Query
-from fastapi.responses import RedirectResponse, JSONResponse
+from fastapi.responses import RedirectResponse, JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from spotipy import Spotify, SpotifyOAuth
 from dotenv import load_dotenv
@@ -18,6 +18,15 @@ import requests
 from mutagen.mp3 import MP3
 import io
 from pathlib import Path
+import queue
+import threading
+import subprocess
+import asyncio
+import hashlib
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 # Load environment variables
 load_dotenv()
@@ -70,13 +79,49 @@ def tag_mp3_basic(mp3_path, title=None, artist=None, album=None):
         print("Error saving basic tags:", e)
         return False
 
-# helper: fügt Cover-Art (APIC) hinzu (jpeg/png)
-def add_cover_art(mp3_path, image_url):
+def detect_image_type(content_type: str, img_bytes: bytes):
+    """Returns (mime, ext) for jpeg/png covers, or (None, None)."""
+    content_type = (content_type or "").lower()
+    if "jpeg" in content_type or "jpg" in content_type:
+        return "image/jpeg", "jpg"
+    if "png" in content_type:
+        return "image/png", "png"
+    # fallback: magic bytes
+    if img_bytes.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg", "jpg"
+    if img_bytes.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png", "png"
+    return None, None
+
+
+def download_cover(image_url: str, timeout: int = 10):
+    """
+    Downloads a cover image. Returns (img_bytes, mime, ext) or None.
+    Kept separate from embedding so the network part can run on the I/O stage.
+    """
     try:
-        resp = requests.get(image_url, timeout=10)
-        resp.raise_for_status()
-        img_data = resp.content
+        r = requests.get(image_url, timeout=timeout)
+        r.raise_for_status()
+        img_bytes = r.content
+    except Exception as e:
+        print("Failed to download cover image:", e)
+        return None
+
+    # quick sanity check on size
+    if len(img_bytes) < 500:  # too small to be a real cover
+        print("Cover too small, ignoring")
+        return None
+
+    mime, ext = detect_image_type(r.headers.get("Content-Type", ""), img_bytes)
+    if not mime:
+        print("Unknown image type:", r.headers.get("Content-Type", ""))
+        return None
+    return img_bytes, mime, ext
+
 
+# helper: fügt Cover-Art (APIC) hinzu (jpeg/png)
+def embed_cover(mp3_path, img_bytes: bytes, mime: str = "image/jpeg"):
+    try:
         audio = MP3(mp3_path, ID3=ID3)
         try:
             audio.add_tags()
@@ -85,84 +130,542 @@ def add_cover_art(mp3_path, image_url):
 
         id3 = ID3(mp3_path)
         id3.delall("APIC")
-        mime = "image/jpeg"  # Spotify liefert meist jpeg
-        id3.add(APIC(encoding=3, mime=mime, type=3, desc="Cover", data=img_data))
+        id3.add(APIC(encoding=3, mime=mime, type=3, desc="Cover", data=img_bytes))
         id3.save(mp3_path)
         return True
     except Exception as e:
         print("Cover embedding failed:", e)
         return False
 
+
+def add_cover_art(mp3_path, image_url):
+    cover = download_cover(image_url)
+    if not cover:
+        return False
+    img_bytes, mime, _ext = cover
+    return embed_cover(mp3_path, img_bytes, mime)
+
+
 def fetch_and_embed_cover(mp3_path: str, image_url: str, save_image_to: str | None = None, timeout: int = 10):
     """
     Downloads image_url, optionally saves it to save_image_to, and embeds it into mp3_path as APIC.
     Returns (embedded_boolean, saved_image_path_or_None).
     """
+    cover = download_cover(image_url, timeout=timeout)
+    if not cover:
+        return False, None
+    img_bytes, mime, ext = cover
+
+    # optionally save to disk
+    saved_path = None
+    if save_image_to:
+        try:
+            p = Path(save_image_to)
+            p.parent.mkdir(parents=True, exist_ok=True)
+            # ensure extension matches detected ext
+            if not p.suffix:
+                p = p.with_suffix(f".{ext}")
+            p.write_bytes(img_bytes)
+            saved_path = str(p)
+        except Exception as e:
+            print("Failed to save cover to disk:", e)
+            saved_path = None
+
+    return embed_cover(mp3_path, img_bytes, mime), saved_path
+
+
+
+## -------------------DOWNLOAD PIPELINE-------------------------
+#
+# Downloading a track is split into two stages so network and CPU work can overlap:
+#   1. fetch     -> YouTube search + raw audio download (I/O bound, thread pool)
+#   2. transcode -> ffmpeg to mp3 + ID3 tags/cover (CPU bound, process pool, one worker per core)
+# The stages are connected by bounded queues, so a fast network can't pile up
+# more raw files than the cores can work through.
+
+FFMPEG_LOCATION = r'C:\HTL\Project-S\ffmpeg-7.1.1-essentials_build\bin'
+MP3_QUALITY = "192"
+
+IO_WORKERS = int(os.getenv("DOWNLOAD_IO_WORKERS", "4"))
+CPU_WORKERS = os.cpu_count() or 1
+
+# global download budget, shared by every pipeline (SSE streams and background sync)
+MAX_CONCURRENT_FETCHES = int(os.getenv("MAX_CONCURRENT_FETCHES", str(IO_WORKERS)))
+DOWNLOAD_RATE_LIMIT = int(os.getenv("DOWNLOAD_RATE_LIMIT", "0"))  # bytes/s for all downloads together, 0 = unlimited
+_fetch_slots = threading.BoundedSemaphore(MAX_CONCURRENT_FETCHES)
+
+# mp3 paths some pipeline is producing right now; a second pipeline on the same
+# playlist (background sync vs SSE, or a cancelled run still draining) must not
+# touch their .partial files
+_inflight_tracks = set()
+_inflight_lock = threading.Lock()
+
+
+def claim_track(mp3_path: str) -> bool:
+    key = os.path.abspath(mp3_path)
+    with _inflight_lock:
+        if key in _inflight_tracks:
+            return False
+        _inflight_tracks.add(key)
+        return True
+
+
+def release_track(mp3_path: str):
+    with _inflight_lock:
+        _inflight_tracks.discard(os.path.abspath(mp3_path))
+
+_io_pool = None
+_cpu_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_io_pool():
+    global _io_pool
+    with _pool_lock:
+        if _io_pool is None:
+            _io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="fetch")
+        return _io_pool
+
+
+def get_cpu_pool():
+    # created lazily: worker processes re-import this module, and must not spawn pools themselves.
+    # "spawn" everywhere (the default on Windows): forking from this multi-threaded
+    # server can copy a lock held by another thread and deadlock the worker
+    global _cpu_pool
+    with _pool_lock:
+        if _cpu_pool is None:
+            _cpu_pool = ProcessPoolExecutor(
+                max_workers=CPU_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _cpu_pool
+
+
+def reset_cpu_pool(broken):
+    # a dead worker breaks the whole executor for good; swap in a fresh one
+    # (only once, even if several dispatchers notice at the same time)
+    global _cpu_pool
+    with _pool_lock:
+        if _cpu_pool is broken:
+            _cpu_pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+    print("⚠️ Transcode process pool was broken, recreated it")
+
+
+def run_transcode(*args):
+    """transcode_and_tag on the process pool; retried once on a fresh pool if a worker died."""
+    for attempt in (1, 2):
+        pool = get_cpu_pool()
+        try:
+            return pool.submit(transcode_and_tag, *args).result()
+        except BrokenProcessPool:
+            reset_cpu_pool(pool)
+            if attempt == 2:
+                raise
+
+
+async def run_transcode_async(*args):
+    """Same as run_transcode, for async endpoints."""
+    loop = asyncio.get_running_loop()
+    for attempt in (1, 2):
+        pool = get_cpu_pool()
+        try:
+            return await loop.run_in_executor(pool, transcode_and_tag, *args)
+        except BrokenProcessPool:
+            reset_cpu_pool(pool)
+            if attempt == 2:
+                raise
+
+
+def ffmpeg_binary():
+    if FFMPEG_LOCATION and os.path.isdir(FFMPEG_LOCATION):
+        exe = "ffmpeg.exe" if os.name == "nt" else "ffmpeg"
+        return os.path.join(FFMPEG_LOCATION, exe)
+    return "ffmpeg"
+
+
+class DownloadCancelled(Exception):
+    pass
+
+
+def partial_dir(folder: str):
+    # work area next to the final files (same filesystem, so os.replace stays atomic)
+    path = os.path.join(folder or ".", ".partial")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+# YoutubeDL instances are expensive to build (extractor + option setup), so
+# they are kept warm in a pool and reused across tracks and requests.
+
+# option profiles: everything that is fixed per profile; only the output
+# template and the cancel flag change per checkout
+YDL_PROFILES = {
+    # raw audio for the transcode stage ("source" template next to the target)
+    "source": {
+        'format': 'bestaudio/best',
+        'noplaylist': True,
+        'quiet': True,
+        'retries': 1,
+        'socket_timeout': 10,
+        'continuedl': True,   # resume existing .part fragments
+        'nopart': False,
+    },
+}
+
+
+class YoutubeDLPool:
+    def __init__(self, max_idle_per_profile: int):
+        self.max_idle = max_idle_per_profile
+        self._idle = {}  # profile -> [(ydl, ctx), ...]
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "reused": 0, "setup_seconds": 0.0}
+
+    def _create(self, profile: str):
+        ctx = {"cancel": None}
+
+        def check_cancel(_progress):
+            # raising from a progress hook aborts yt-dlp mid-download
+            cancel = ctx["cancel"]
+            if cancel is not None and cancel.is_set():
+                raise DownloadCancelled()
+
+        opts = dict(YDL_PROFILES[profile], progress_hooks=[check_cancel])
+        if DOWNLOAD_RATE_LIMIT:
+            # every slot gets an equal share, so the sum never exceeds the budget
+            opts['ratelimit'] = max(1, DOWNLOAD_RATE_LIMIT // MAX_CONCURRENT_FETCHES)
+
+        start = time.perf_counter()
+        ydl = yt_dlp.YoutubeDL(opts)
+        self._check_outtmpl_override(ydl)
+        with self._lock:
+            self.stats["created"] += 1
+            self.stats["setup_seconds"] += time.perf_counter() - start
+        return ydl, ctx
+
+    @staticmethod
+    def _set_outtmpl(ydl, outtmpl: str):
+        # relies on yt-dlp reading params['outtmpl'] (a dict) at prepare_filename time
+        ydl.params['outtmpl']['default'] = outtmpl
+
+    @classmethod
+    def _check_outtmpl_override(cls, ydl):
+        """
+        Older yt-dlp versions parse the template once in __init__, so changing it
+        afterwards is silently ignored and every track would land in the CWD.
+        Refuse to pool instances in that case instead of downloading to the wrong place.
+        """
+        probe = os.path.abspath("ydl-outtmpl-probe")
+        try:
+            cls._set_outtmpl(ydl, f"{probe}.%(ext)s")
+            resolved = ydl.prepare_filename({"id": "probe", "title": "probe", "ext": "tmp"})
+        except Exception as e:
+            raise RuntimeError(f"yt-dlp does not support per-download output templates, please upgrade: {e}")
+        if os.path.abspath(resolved) != f"{probe}.tmp":
+            raise RuntimeError(
+                f"yt-dlp ignored the output template ({resolved}), please upgrade yt-dlp (pip install -U yt-dlp)"
+            )
+
+    def warm(self, profile: str, count: int):
+        entries = [self._create(profile) for _ in range(count)]
+        with self._lock:
+            idle = self._idle.setdefault(profile, [])
+            idle.extend(entries[:max(0, self.max_idle - len(idle))])
+
+    @contextmanager
+    def instance(self, profile: str, outtmpl: str, cancel: threading.Event | None = None):
+        """Checks out an instance for exclusive use; YoutubeDL is not thread-safe."""
+        with self._lock:
+            idle = self._idle.get(profile)
+            entry = idle.pop() if idle else None
+            if entry:
+                self.stats["reused"] += 1
+        ydl, ctx = entry or self._create(profile)
+
+        self._set_outtmpl(ydl, outtmpl)
+        ctx["cancel"] = cancel
+        try:
+            yield ydl
+        finally:
+            ctx["cancel"] = None
+            with self._lock:
+                idle = self._idle.setdefault(profile, [])
+                if len(idle) < self.max_idle:
+                    idle.append((ydl, ctx))
+                    ydl = None
+            if ydl is not None:
+                ydl.close()
+
+    def close_all(self):
+        with self._lock:
+            entries = [e for idle in self._idle.values() for e in idle]
+            self._idle.clear()
+        for ydl, _ctx in entries:
+            ydl.close()
+
+
+ydl_pool = YoutubeDLPool(max_idle_per_profile=MAX_CONCURRENT_FETCHES)
+
+
+def fetch_raw_audio(video_url: str, out_base: str, cancel: threading.Event | None = None):
+    """
+    Stage 1: downloads the best audio stream as-is (no ffmpeg postprocessing).
+    out_base should live in a partial_dir(); an interrupted download leaves its
+    .part file there and the next attempt at the same video and format continues it.
+    Returns the path of the downloaded source file.
+    """
+    def check_cancel():
+        if cancel is not None and cancel.is_set():
+            raise DownloadCancelled()
+
+    # wait for a slot in short steps, so a cancel isn't stuck behind other downloads
+    while not _fetch_slots.acquire(timeout=0.5):
+        check_cancel()
     try:
-        r = requests.get(image_url, timeout=timeout)
-        r.raise_for_status()
-        img_bytes = r.content
+        check_cancel()
+        try:
+            # video id + format id in the name: only the very same stream is ever resumed
+            outtmpl = f"{out_base}.%(id)s.%(format_id)s.source.%(ext)s"
+            with ydl_pool.instance("source", outtmpl, cancel) as ydl:
+                info = ydl.extract_info(video_url, download=True)
+                raw_path = ydl.prepare_filename(info)
+        except Exception:
+            # yt-dlp may wrap the hook's exception, so look at the flag itself
+            check_cancel()
+            raise
+    finally:
+        _fetch_slots.release()
 
-        # quick sanity check on size
-        if len(img_bytes) < 500:  # too small to be a real cover
-            print("Cover too small, ignoring")
-            return False, None
-
-        # detect type: prefer Content-Type header, fallback to imghdr
-        content_type = r.headers.get("Content-Type", "").lower()
-        if "jpeg" in content_type or "jpg" in content_type:
-            mime = "image/jpeg"
-            ext = "jpg"
-        elif "png" in content_type:
-            mime = "image/png"
-            ext = "png"
-        else:
-            # fallback
-            detected = imghdr.what(None, h=img_bytes)
-            if detected == "jpeg" or detected == "jpg":
-                mime = "image/jpeg"; ext = "jpg"
-            elif detected == "png":
-                mime = "image/png"; ext = "png"
-            else:
-                print("Unknown image type:", content_type, detected)
-                return False, None
+    if not os.path.exists(raw_path):
+        raise FileNotFoundError(f"Downloaded audio not found: {raw_path}")
+    return raw_path
 
-        # optionally save to disk
-        saved_path = None
-        if save_image_to:
+
+def remove_stale_sources(work_dir: str, mp3_path: str):
+    # raw files / .part fragments of other videos or formats for this track
+    stem = os.path.splitext(os.path.basename(mp3_path))[0]
+    pattern = re.compile(re.escape(stem) + r"\.[^.]+\.[^.]+\.source\..+$")
+    try:
+        names = os.listdir(work_dir)
+    except OSError:
+        return
+    for name in names:
+        if pattern.match(name):
             try:
-                p = Path(save_image_to)
-                p.parent.mkdir(parents=True, exist_ok=True)
-                # ensure extension matches detected ext
-                if not p.suffix:
-                    p = p.with_suffix(f".{ext}")
-                p.write_bytes(img_bytes)
-                saved_path = str(p)
-            except Exception as e:
-                print("Failed to save cover to disk:", e)
-                saved_path = None
+                os.remove(os.path.join(work_dir, name))
+            except OSError:
+                pass
+
+
+def transcode_and_tag(raw_path: str, mp3_path: str, title=None, artist=None, album=None,
+                      cover_bytes: bytes | None = None, cover_mime: str = "image/jpeg"):
+    """
+    Stage 2: converts raw_path to mp3_path with ffmpeg and writes tags + cover.
+    The cover is passed in as bytes (downloaded by the fetch stage), so no
+    network work ever occupies a CPU worker.
+    Everything happens on a temp file next to raw_path, which is renamed onto
+    mp3_path only once it is complete, so mp3_path never holds a half-written file.
+    Runs inside the process pool, so it must stay a picklable top-level function.
+    Returns the transcode duration in seconds.
+    """
+    start = time.time()
+    tmp_path = os.path.join(os.path.dirname(raw_path), f"{os.path.basename(mp3_path)}.tmp")
+    cmd = [
+        ffmpeg_binary(), "-y", "-loglevel", "error",
+        "-i", raw_path,
+        "-vn", "-codec:a", "libmp3lame", "-b:a", f"{MP3_QUALITY}k",
+        "-f", "mp3", tmp_path,
+    ]
+    try:
+        try:
+            subprocess.run(cmd, check=True, capture_output=True)
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"ffmpeg failed: {e.stderr.decode(errors='ignore').strip()}")
 
-        # embed into mp3 using mutagen
         try:
-            audio = MP3(mp3_path, ID3=ID3)
+            tag_mp3_basic(tmp_path, title=title, artist=artist, album=album)
+        except Exception as e:
+            print("Basic tagging failed for", mp3_path, e)
+
+        if cover_bytes:
+            embed_cover(tmp_path, cover_bytes, cover_mime)
+
+        os.replace(tmp_path, mp3_path)
+        remove_stale_sources(os.path.dirname(raw_path), mp3_path)
+    finally:
+        for leftover in (tmp_path, raw_path):
             try:
-                audio.add_tags()
-            except error:
+                os.remove(leftover)
+            except OSError:
                 pass
-            id3 = ID3(mp3_path)
-            id3.delall("APIC")
-            id3.add(APIC(encoding=3, mime=mime, type=3, desc="Cover", data=img_bytes))
-            id3.save(mp3_path)
-            return True, saved_path
-        except Exception as e:
-            print("Failed to embed cover into mp3:", e)
-            return False, saved_path
 
+    return round(time.time() - start, 2)
+
+
+def _fetch_stage(job, cancel=None):
+    # YouTube search, raw download and cover image; fills job["raw_path"] (plus
+    # job["cover_bytes"]/["cover_mime"]) or job["status"] on failure
+    try:
+        search_query = f"{job['artist']} {job['song_name']} oficial lyrics"
+        search = VideosSearch(search_query, limit=1)
+        yt_results = search.result()
     except Exception as e:
-        print("Failed to download cover image:", e)
-        return False, None
+        job["status"] = f"youtube search error: {str(e)}"
+        return False
+
+    if not yt_results.get("result"):
+        job["status"] = "not found"
+        return False
+
+    video_url = yt_results["result"][0]["link"]
+    try:
+        start = time.time()
+        out_base = os.path.join(partial_dir(job["folder"]), job["cleaned_filename"])
+        job["raw_path"] = fetch_raw_audio(video_url, out_base, cancel)
+        job["duration"] = round(time.time() - start, 2)
+    except DownloadCancelled:
+        job["status"] = "cancelled"
+        return False
+    except Exception as e:
+        job["status"] = f"error: {str(e)}"
+        return False
+
+    # a missing cover never fails the track
+    cover = download_cover(job["cover_url"]) if job.get("cover_url") else None
+    if cover:
+        job["cover_bytes"], job["cover_mime"], _ext = cover
+    return True
 
 
+def run_download_pipeline(jobs, cancel: threading.Event | None = None):
+    """
+    Pushes jobs through the fetch -> transcode stages.
+    Yields every job dict once it is finished (completion order, not playlist order).
+    Each job needs: song_name, artist, album, cover_url, folder, cleaned_filename, mp3_path.
+    Setting cancel aborts running downloads; every job not yet done then comes
+    back with status "cancelled". Tracks another pipeline is already producing
+    come back with status "in progress elsewhere".
+    """
+    cancel = cancel or threading.Event()
+    jobs = list(jobs)
+    if not jobs:
+        return
+
+    fetch_q = queue.Queue(maxsize=IO_WORKERS * 2)
+    transcode_q = queue.Queue(maxsize=CPU_WORKERS * 2)
+    results_q = queue.Queue()
+
+    def feeder():
+        for job in jobs:
+            fetch_q.put(job)
+        for _ in range(IO_WORKERS):
+            fetch_q.put(None)
+
+    def finish(job):
+        # for claimed jobs only: hands the result back and frees the mp3 path
+        release_track(job["mp3_path"])
+        results_q.put(job)
+
+    def fetch_worker():
+        while True:
+            job = fetch_q.get()
+            if job is None:
+                return
+            if cancel.is_set():
+                job["status"] = "cancelled"
+                results_q.put(job)
+            elif not claim_track(job["mp3_path"]):
+                job["status"] = "in progress elsewhere"
+                results_q.put(job)
+            elif os.path.exists(job["mp3_path"]):
+                # finished by another pipeline since the jobs were built
+                job["status"] = "skipped"
+                finish(job)
+            elif _fetch_stage(job, cancel):
+                transcode_q.put(job)  # blocks while the CPU stage is saturated
+            else:
+                finish(job)
+
+    def transcode_worker():
+        # one dispatcher per core keeps exactly CPU_WORKERS transcodes in flight
+        while True:
+            job = transcode_q.get()
+            if job is None:
+                return
+            if cancel.is_set():
+                # the raw file stays in .partial, a later run reuses it
+                job.pop("raw_path", None)
+                job.pop("cover_bytes", None)
+                job["status"] = "cancelled"
+                finish(job)
+                continue
+            try:
+                transcode_seconds = run_transcode(
+                    job.pop("raw_path"), job["mp3_path"],
+                    job["song_name"], job["artist"], job["album"],
+                    job.pop("cover_bytes", None), job.pop("cover_mime", "image/jpeg"),
+                )
+                job["duration"] = round(job["duration"] + transcode_seconds, 2)
+                job["status"] = "downloaded"
+            except Exception as e:
+                job["status"] = f"error: {str(e)}"
+            finish(job)
+
+    fetchers = [threading.Thread(target=fetch_worker, daemon=True) for _ in range(IO_WORKERS)]
+    transcoders = [threading.Thread(target=transcode_worker, daemon=True) for _ in range(CPU_WORKERS)]
+
+    def closer():
+        # once all fetchers are done, tell the transcoders to finish up
+        for t in fetchers:
+            t.join()
+        for _ in range(CPU_WORKERS):
+            transcode_q.put(None)
+
+    for t in [threading.Thread(target=feeder, daemon=True), *fetchers, *transcoders,
+              threading.Thread(target=closer, daemon=True)]:
+        t.start()
+
+    for _ in range(len(jobs)):
+        yield results_q.get()
+
+
+def build_playlist_jobs(playlist_folder: str, all_items):
+    """
+    Turns Spotify playlist items into pipeline jobs.
+    Tracks whose mp3 already exists come back with status "skipped".
+    """
+    jobs = []
+    for index, item in enumerate(all_items, start=1):
+        # item is the original Spotify playlist item
+        track_obj = item.get("track") or {}
+        song_name = track_obj.get("name") or "unknown"
+        artists = track_obj.get("artists") or []
+        artist = artists[0].get("name") if artists else "unknown artist"
+        album_obj = track_obj.get("album") or {}
+        images = album_obj.get("images") or []
+
+        # build filename safe for filesystem
+        filename = f"{song_name} by {artist}"
+        cleaned_filename = re.sub(r'[<>:\"/\\|?*\']', '', filename).strip()
+
+        job = {
+            "index": index,
+            "song": filename,
+            "song_name": song_name,
+            "artist": artist,
+            "album": album_obj.get("name"),
+            "cover_url": images[0].get("url") if images else None,  # usually the largest
+            "folder": playlist_folder,
+            "cleaned_filename": cleaned_filename,
+            "mp3_path": os.path.join(playlist_folder, f"{cleaned_filename}.mp3"),
+            "status": "",
+            "duration": 0,
+        }
+        if os.path.exists(job["mp3_path"]):
+            job["status"] = "skipped"
+        jobs.append(job)
+
+    return jobs
+
 
 ## -------------------API CALLS-------------------------
 
@@ -184,6 +687,243 @@ def get_all_playlist_tracks(sp, playlist_id):
 
     return all_tracks
 
+
+def get_all_user_playlists(sp):
+    all_playlists = []
+    limit = 50
+    offset = 0
+
+    while True:
+        results = sp.current_user_playlists(limit=limit, offset=offset)
+        items = results.get("items", [])
+        all_playlists.extend(items)
+
+        if not results.get("next") or not items:
+            break  # No more pages
+
+        offset += limit
+
+    return all_playlists
+
+
+## -------------------CONDITIONAL GET (ETag / 304)-------------------------
+
+# playlist_id -> (snapshot_id, [(name, artist), ...]); saves re-paging Spotify
+# when only the local library changed
+_tracks_cache = {}
+
+
+def make_etag(*parts):
+    digest = hashlib.sha1(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [c.strip() for c in header.split(",")]
+    # weak comparison, as required for If-None-Match
+    return any(c.removeprefix("W/") == etag for c in candidates)
+
+
+def etag_response(request: Request, etag: str, build_content):
+    """
+    Returns 304 if the client already has etag, otherwise builds the JSON body.
+    no-cache makes the browser revalidate every time instead of serving stale lists.
+    """
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(build_content(), headers=headers)
+
+
+def library_files(folder: str):
+    # names of the mp3s already on disk; one directory scan instead of a stat per track
+    try:
+        with os.scandir(folder) as entries:
+            return {e.name for e in entries if e.is_file() and e.name.endswith(".mp3")}
+    except OSError:
+        return set()
+
+
+def get_cached_track_list(sp, playlist_id: str, snapshot_id: str):
+    cached = _tracks_cache.get(playlist_id)
+    if cached and cached[0] == snapshot_id:
+        return cached[1]
+
+    # ✅ Fetch all tracks, not just the first 100
+    track_list = []
+    for t in get_all_playlist_tracks(sp, playlist_id):
+        track_obj = t.get("track") or {}
+        artists = track_obj.get("artists") or []
+        track_list.append((
+            track_obj.get("name") or "unknown",
+            artists[0].get("name") if artists else "unknown artist",
+        ))
+
+    _tracks_cache[playlist_id] = (snapshot_id, track_list)
+    return track_list
+
+
+## -------------------BACKGROUND LIBRARY SYNC-------------------------
+#
+# Periodically pages through all of the user's playlists and downloads missing
+# tracks for every playlist whose snapshot_id changed since its last clean sync.
+# Downloads go through the same pipeline and global fetch budget as the SSE stream.
+
+SYNC_INTERVAL = int(os.getenv("SYNC_INTERVAL", "0"))  # seconds, 0 = don't start on boot
+
+# playlist_id -> snapshot_id of the last sync that finished without errors
+_synced_snapshots = {}
+# playlist_id -> (snapshot_id, {mp3_path, ...}) of tracks YouTube has no match for;
+# not searched again until the playlist's snapshot changes
+_unavailable_tracks = {}
+_sync_stop = threading.Event()
+_sync_thread = None
+_sync_status = {
+    "running": False,
+    "interval": None,
+    "last_run": None,
+    "current": None,
+    "last_error": None,
+    "playlists": {},
+}
+# guards _sync_status: the sync thread writes it while endpoints serialize it
+_sync_status_lock = threading.Lock()
+
+
+def update_sync_status(**fields):
+    with _sync_status_lock:
+        _sync_status.update(fields)
+
+
+def sync_status_snapshot():
+    with _sync_status_lock:
+        snapshot = dict(_sync_status)
+        snapshot["playlists"] = {pid: dict(info) for pid, info in _sync_status["playlists"].items()}
+    return snapshot
+
+
+def background_spotify():
+    # no browser token needed: use the refreshable token spotipy keeps in .cache
+    try:
+        if not sp_oauth.get_cached_token():
+            return None
+    except Exception as e:
+        print("Cached Spotify token unavailable:", e)
+        return None
+    return Spotify(auth_manager=sp_oauth)
+
+
+def is_permanent_failure(status: str) -> bool:
+    # no YouTube match (local files, removed or region-blocked songs): retrying
+    # the same snapshot won't help, unlike cancels or download/transcode errors
+    return status == "not found" or status.startswith("youtube search error")
+
+
+def sync_playlist(sp, playlist, snapshot_id):
+    playlist_folder = os.path.join("music", playlist["name"])
+    os.makedirs(playlist_folder, exist_ok=True)
+
+    known_snapshot, unavailable = _unavailable_tracks.get(playlist["id"], (None, set()))
+    if known_snapshot != snapshot_id:
+        unavailable = set()  # playlist changed, give every track another chance
+
+    all_items = get_all_playlist_tracks(sp, playlist["id"])
+    jobs = build_playlist_jobs(playlist_folder, all_items)
+    result = {"total": len(jobs), "skipped": 0, "downloaded": 0, "unavailable": 0, "failed": 0}
+
+    pending = []
+    for job in jobs:
+        if job["status"] == "skipped":
+            result["skipped"] += 1
+        elif job["mp3_path"] in unavailable:
+            result["unavailable"] += 1
+        else:
+            pending.append(job)
+
+    for job in run_download_pipeline(pending, cancel=_sync_stop):
+        if job["status"] == "downloaded":
+            result["downloaded"] += 1
+        elif job["status"] == "skipped":
+            result["skipped"] += 1
+        elif is_permanent_failure(job["status"]):
+            result["unavailable"] += 1
+            unavailable.add(job["mp3_path"])
+            print(f"Sync: {job['song']} -> {job['status']} (not retried until the playlist changes)")
+        else:
+            # transient: cancelled, in progress elsewhere, download/transcode errors
+            result["failed"] += 1
+            print(f"Sync: {job['song']} -> {job['status']}")
+
+    _unavailable_tracks[playlist["id"]] = (snapshot_id, unavailable)
+    return result
+
+
+def sync_library_once():
+    sp = background_spotify()
+    if sp is None:
+        update_sync_status(last_error="Not authenticated")
+        return
+
+    update_sync_status(last_error=None)
+    for playlist in get_all_user_playlists(sp):
+        if _sync_stop.is_set():
+            break
+
+        snapshot_id = playlist.get("snapshot_id")
+        if _synced_snapshots.get(playlist["id"]) == snapshot_id:
+            continue  # unchanged since last clean sync
+
+        update_sync_status(current=playlist["name"])
+        try:
+            result = sync_playlist(sp, playlist, snapshot_id)
+        except Exception as e:
+            print(f"Sync of '{playlist['name']}' failed:", e)
+            update_sync_status(last_error=str(e))
+            continue
+
+        # transient failures keep the playlist dirty so the next round retries them;
+        # unavailable tracks don't, they are remembered against this snapshot
+        if result["failed"] == 0:
+            _synced_snapshots[playlist["id"]] = snapshot_id
+        with _sync_status_lock:
+            _sync_status["playlists"][playlist["id"]] = {"name": playlist["name"], **result}
+        print(f"🔄 Synced '{playlist['name']}': {result}")
+
+    update_sync_status(current=None, last_run=time.time())
+
+
+def _sync_loop(interval: int):
+    while not _sync_stop.is_set():
+        try:
+            sync_library_once()
+        except Exception as e:
+            print("Background sync round failed:", e)
+            update_sync_status(last_error=str(e))
+        _sync_stop.wait(interval)
+    update_sync_status(running=False)
+
+
+def start_background_sync(interval: int):
+    global _sync_thread
+    if _sync_thread and _sync_thread.is_alive():
+        return False
+    _sync_stop.clear()
+    update_sync_status(running=True, interval=interval)
+    _sync_thread = threading.Thread(target=_sync_loop, args=(interval,), daemon=True, name="library-sync")
+    _sync_thread.start()
+    return True
+
+
+def stop_background_sync():
+    # also aborts the downloads of the playlist currently being synced
+    _sync_stop.set()
+
+
 # In-memory token store (simple for now)
 access_token = None
 
@@ -208,47 +948,48 @@ def callback(request: Request):
         return RedirectResponse("http://localhost:4200/home?login=fail")
 
 @app.get("/playlists")
-def get_playlists():
+def get_playlists(request: Request):
     global access_token
     if not access_token:
         return JSONResponse({"error": "Not authenticated"}, status_code=401)
 
     sp = Spotify(auth=access_token)
-    playlists = sp.current_user_playlists()
-    result = [{"id": p["id"], "name": p["name"]} for p in playlists["items"]]
-    return result
+    items = get_all_user_playlists(sp)
+
+    etag = make_etag([(p["id"], p["name"], p.get("snapshot_id")) for p in items])
+    return etag_response(request, etag, lambda: [{"id": p["id"], "name": p["name"]} for p in items])
 
 
 @app.get("/playlists/{playlist_id}/tracks")
-def get_playlist_tracks(playlist_id: str):
+def get_playlist_tracks(playlist_id: str, request: Request):
     global access_token
     if not access_token:
         return JSONResponse({"error": "Not authenticated"}, status_code=401)
 
     sp = Spotify(auth=access_token)
-    playlist = sp.playlist(playlist_id)
+    # only name + snapshot here; the full track pages are fetched when the snapshot changed
+    playlist = sp.playlist(playlist_id, fields="name,snapshot_id")
     playlist_name = playlist["name"]
+    snapshot_id = playlist.get("snapshot_id")
     folder = os.path.join("music", playlist_name)
 
-    # ✅ Fetch all tracks, not just the first 100
-    all_items = get_all_playlist_tracks(sp, playlist_id)
-
-    tracks = []
-    for t in all_items:
-        name = t["track"]["name"]
-        artist = t["track"]["artists"][0]["name"]
-        filename = f"{name} by {artist}"
-        cleaned = re.sub(r'[<>:"/\\|?*\']', '', filename).strip()
-        path = os.path.join(folder, f"{cleaned}.mp3")
-        already_downloaded = os.path.exists(path)
-
-        tracks.append({
-            "name": name,
-            "artist": artist,
-            "downloaded": already_downloaded
-        })
+    on_disk = library_files(folder)
+    etag = make_etag(playlist_id, playlist_name, snapshot_id, sorted(on_disk))
+
+    def build():
+        tracks = []
+        for name, artist in get_cached_track_list(sp, playlist_id, snapshot_id):
+            filename = f"{name} by {artist}"
+            cleaned = re.sub(r'[<>:"/\\|?*\']', '', filename).strip()
 
-    return tracks
+            tracks.append({
+                "name": name,
+                "artist": artist,
+                "downloaded": f"{cleaned}.mp3" in on_disk
+            })
+        return tracks
+
+    return etag_response(request, etag, build)
 
 
 # 📺 YouTube Search Endpoint
@@ -284,30 +1025,17 @@ async def download_audio(req: DownloadRequest):
     filename = re.sub(r'[^\w\s-]', '', req.filename).strip().replace(" ", "_")
     mp3_path = f"{filename}.mp3"
 
-    ydl_opts = {
-        'format': 'bestaudio/best',
-        'noplaylist': True,
-        'ffmpeg_location': r'C:\HTL\Project-S\ffmpeg-7.1.1-essentials_build\bin',
-        'outtmpl': f'{filename}.%(ext)s',
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '192',
-        }],
-        'quiet': True,
-    }
-
+    loop = asyncio.get_running_loop()
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([req.url])
-
-        if not os.path.exists(mp3_path):
-            return {"error": "MP3 file not found after download."}
+        # stage 1: raw audio on the I/O pool
+        out_base = os.path.join(partial_dir(os.path.dirname(mp3_path)), filename)
+        raw_path = await loop.run_in_executor(get_io_pool(), fetch_raw_audio, req.url, out_base)
 
         # grundlegende Tags aus Anfrage
         title_tag = req.filename.replace("_", " ")
         artist_tag = getattr(req, "author", None) or "unknown artist"
         album_tag = getattr(req, "album", None) or "downloaded single"
+        cover_url = None
 
         # Versuch: Spotify-Abgleich, falls wir token haben
         try:
@@ -325,23 +1053,22 @@ async def download_audio(req: DownloadRequest):
                         album_tag = spotify_album
                     if images:
                         cover_url = images[0].get("url")  # größtes Bild
-                        # cover speichern (optional fehlschlagen lassen)
-                        try:
-                            added = add_cover_art(mp3_path, cover_url)
-                            if not added:
-                                print("Cover konnte nicht eingebettet werden.")
-                        except Exception as e:
-                            print("Cover embedding exception:", e)
         except Exception as e:
             print("Spotify lookup failed (ignored):", e)
 
-        # write basic tags (Titel/Artist/Album)
-        try:
-            tag_ok = tag_mp3_basic(mp3_path, title=title_tag, artist=artist_tag, album=album_tag)
-            if not tag_ok:
-                print("Basic tagging returned False")
-        except Exception as e:
-            print("Tagging failed:", e)
+        # cover bytes are fetched on the I/O pool, the process pool only embeds them
+        cover = None
+        if cover_url:
+            cover = await loop.run_in_executor(get_io_pool(), download_cover, cover_url)
+        cover_bytes, cover_mime, _ext = cover or (None, "image/jpeg", None)
+
+        # stage 2: transcode + tags/cover on the process pool
+        await run_transcode_async(
+            raw_path, mp3_path, title_tag, artist_tag, album_tag, cover_bytes, cover_mime,
+        )
+
+        if not os.path.exists(mp3_path):
+            return {"error": "MP3 file not found after download."}
 
         return FileResponse(mp3_path, media_type="audio/mpeg", filename=mp3_path)
 
@@ -349,127 +1076,268 @@ async def download_audio(req: DownloadRequest):
         return {"error": str(e)}
     
     
-@app.get("/playlists/{playlist_id}/download-all-stream")
-def download_playlist_stream(playlist_id: str):
-    def generate():
-        global access_token
-        if not access_token:
-            yield f"data: {json.dumps({'error': 'Not authenticated'})}\n\n"
-            return
-
-        sp = Spotify(auth=access_token)
-        playlist = sp.playlist(playlist_id)
+## -------------------PROGRESS STREAM (SSE)-------------------------
+#
+# A playlist download runs in its own thread and appends events to a log.
+# The SSE connection only reads that log, so a client reconnecting with
+# Last-Event-ID picks up where it left off instead of restarting the download.
+
+SSE_HEARTBEAT = 15        # seconds without events before a keep-alive comment is sent
+SSE_RETRY_MS = 3000       # reconnect delay suggested to EventSource
+SSE_COALESCE_AFTER = 5    # pending progress events before they get collapsed into one
+SSE_CANCEL_GRACE = 10     # seconds a run survives without any client, enough to reconnect
+
+
+class PlaylistDownloadRun:
+    def __init__(self, playlist_id: str):
+        self.playlist_id = playlist_id
+        self.run_id = f"{int(time.time() * 1000):x}"
+        self.events = []  # payload dicts, event id = run_id + position
+        self.done = False
+        self.cond = threading.Condition()
+        self.cancel = threading.Event()
+        self.clients = 0
+        self._cancel_timer = None
+
+    def attach(self):
+        with self.cond:
+            self.clients += 1
+            if self._cancel_timer:
+                self._cancel_timer.cancel()
+                self._cancel_timer = None
+
+    def detach(self):
+        # last client gone: cancel unless someone reconnects within the grace period
+        with self.cond:
+            self.clients -= 1
+            if self.clients == 0 and not self.done:
+                self._cancel_timer = threading.Timer(SSE_CANCEL_GRACE, self.cancel.set)
+                self._cancel_timer.daemon = True
+                self._cancel_timer.start()
+
+    def publish(self, payload):
+        with self.cond:
+            self.events.append(payload)
+            self.cond.notify_all()
+
+    def finish(self):
+        with self.cond:
+            self.done = True
+            self.cond.notify_all()
+
+    def wait_events(self, after: int, timeout: float):
+        # returns (events after position `after`, done flag); blocks up to timeout
+        with self.cond:
+            self.cond.wait_for(lambda: len(self.events) > after or self.done, timeout=timeout)
+            return self.events[after:], self.done and len(self.events) <= after
+
+    def resume_position(self, last_event_id: str | None) -> int:
+        if not last_event_id:
+            return 0
+        run_id, _, seq = last_event_id.partition("-")
+        if run_id != self.run_id or not seq.isdigit():
+            return 0
+        return min(int(seq), len(self.events))
+
+
+# playlist_id -> latest PlaylistDownloadRun
+_download_runs = {}
+_download_runs_lock = threading.Lock()
+
+
+def run_playlist_download(run: PlaylistDownloadRun, sp):
+    try:
+        playlist = sp.playlist(run.playlist_id)
         playlist_name = playlist["name"]
         playlist_folder = os.path.join("music", playlist_name)
         os.makedirs(playlist_folder, exist_ok=True)
 
         # Fetch all track objects from Spotify
-        all_items = get_all_playlist_tracks(sp, playlist_id)
+        all_items = get_all_playlist_tracks(sp, run.playlist_id)
         total = len(all_items)
+        completed = 0
 
         print(f"🌀 Starting to download {total} tracks from '{playlist_name}'")
 
-        for index, item in enumerate(all_items, start=1):
-            # item is the original Spotify playlist item
-            track_obj = item.get("track") or {}
-            song_name = track_obj.get("name") or "unknown"
-            artists = track_obj.get("artists") or []
-            artist = artists[0].get("name") if artists else "unknown artist"
-
-            # build filename safe for filesystem
-            filename = f"{song_name} by {artist}"
-            cleaned_filename = re.sub(r'[<>:\"/\\|?*\']', '', filename).strip()
-            mp3_path = os.path.join(playlist_folder, f"{cleaned_filename}.mp3")
-
-            current_data = {
-                "index": index,
+        def event(job):
+            return {
+                "index": job["index"],
+                "completed": completed,
                 "total": total,
-                "song": filename,
-                "status": "",
-                "duration": 0
+                "song": job["song"],
+                "status": job["status"],
+                "duration": job["duration"],
             }
 
-            if os.path.exists(mp3_path):
-                current_data["status"] = "skipped"
-                yield f"data: {json.dumps(current_data)}\n\n"
+        jobs = []
+        for job in build_playlist_jobs(playlist_folder, all_items):
+            if job["status"] == "skipped":
+                completed += 1
+                run.publish(event(job))
                 continue
+            jobs.append(job)
 
-            # Search YouTube
-            try:
-                search_query = f"{artist} {song_name} oficial lyrics"
-                search = VideosSearch(search_query, limit=1)
-                yt_results = search.result()
-            except Exception as e:
-                current_data["status"] = f"youtube search error: {str(e)}"
-                yield f"data: {json.dumps(current_data)}\n\n"
-                continue
+        # fetch and transcode run in parallel stages; events arrive as tracks finish
+        for job in run_download_pipeline(jobs, cancel=run.cancel):
+            completed += 1
+            run.publish(event(job))
 
-            if not yt_results.get("result"):
-                current_data["status"] = "not found"
-                yield f"data: {json.dumps(current_data)}\n\n"
-                continue
+        if run.cancel.is_set():
+            print(f"⏹️ Download of '{playlist_name}' cancelled")
+            run.publish({"cancelled": True})
+        else:
+            print("✅ All tracks processed")
+            run.publish({"done": True})
+    except Exception as e:
+        print("Playlist download failed:", e)
+        run.publish({"error": str(e)})
+    finally:
+        run.finish()
 
-            video_url = yt_results["result"][0]["link"]
-            ydl_opts = {
-                'format': 'bestaudio/best',
-                'noplaylist': True,
-                'ffmpeg_location': r'C:\HTL\Project-S\ffmpeg-7.1.1-essentials_build\bin',
-                'outtmpl': os.path.join(playlist_folder, f"{cleaned_filename}.%(ext)s"),
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '192',
-                }],
-                'quiet': True,
-                'retries': 1,
-                'socket_timeout': 10,
-            }
 
-            try:
-                start = time.time()
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    ydl.download([video_url])
-                end = time.time()
-                current_data["duration"] = round(end - start, 2)
-                current_data["status"] = "downloaded"
-            except Exception as e:
-                current_data["status"] = f"error: {str(e)}"
-                yield f"data: {json.dumps(current_data)}\n\n"
-                continue
+def get_or_start_run(playlist_id: str, last_event_id: str | None):
+    """
+    Reuses the running download for playlist_id, or the finished one when the
+    client is resuming it. Otherwise starts a new run.
+    """
+    with _download_runs_lock:
+        run = _download_runs.get(playlist_id)
+        resuming = run is not None and last_event_id and last_event_id.startswith(f"{run.run_id}-")
+        if run is not None and ((not run.done and not run.cancel.is_set()) or resuming):
+            return run
 
-            # After successful download, write tags
-            try:
-                # album from Spotify track object when available
-                album_obj = track_obj.get("album", {}) if track_obj else {}
-                album_name = album_obj.get("name") if album_obj else None
-
-                # write title, artist, album
-                try:
-                    tag_mp3_basic(mp3_path, title=song_name, artist=artist, album=album_name)
-                except Exception as e:
-                    print("Basic tagging failed for", cleaned_filename, e)
-
-                # try to embed spotify album cover if available
-                try:
-                    images = album_obj.get("images", []) if album_obj else []
-                    if images:
-                        cover_url = images[0].get("url")  # usually the largest
-                        if cover_url:
-                            try:
-                                add_cover_art(mp3_path, cover_url)
-                            except Exception as e:
-                                print("Cover embedding failed for", cleaned_filename, e)
-                except Exception as e:
-                    print("Cover handling error for", cleaned_filename, e)
+        run = PlaylistDownloadRun(playlist_id)
+        _download_runs[playlist_id] = run
+
+    threading.Thread(
+        target=run_playlist_download, args=(run, Spotify(auth=access_token)),
+        daemon=True, name=f"playlist-{playlist_id}",
+    ).start()
+    return run
+
+
+def sse_event(event_id: str, payload) -> str:
+    return f"id: {event_id}\ndata: {json.dumps(payload)}\n\n"
+
+
+def coalesce_events(pending):
+    """
+    pending is a list of (seq, payload). When the client is behind, only the newest
+    progress event is sent, carrying "coalesced" (how many it stands for);
+    done/error events are always kept.
+    """
+    progress = [(seq, e) for seq, e in pending if "index" in e]
+    if len(progress) <= SSE_COALESCE_AFTER:
+        return pending
+    seq, latest = progress[-1]
+    return [(seq, {**latest, "coalesced": len(progress)})] + [(n, e) for n, e in pending if "index" not in e]
+
+
+@app.get("/playlists/{playlist_id}/download-all-stream")
+def download_playlist_stream(playlist_id: str, request: Request):
+    global access_token
+    last_event_id = request.headers.get("last-event-id")
+
+    async def generate():
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+
+        if not access_token:
+            yield f"data: {json.dumps({'error': 'Not authenticated'})}\n\n"
+            return
+
+        run = get_or_start_run(playlist_id, last_event_id)
+        position = run.resume_position(last_event_id)
+        run.attach()
+        try:
+            idle = 0.0
+            while True:
+                # short waits so a closed connection is noticed within a second
+                pending, finished = await asyncio.to_thread(run.wait_events, position, 1.0)
+                if finished:
+                    return
+                if await request.is_disconnected():
+                    return
+                if not pending:
+                    idle += 1.0
+                    if idle >= SSE_HEARTBEAT:
+                        idle = 0.0
+                        yield ": keep-alive\n\n"
+                    continue
+
+                idle = 0.0
+                numbered = list(enumerate(pending, start=position + 1))
+                position += len(pending)
+                yield "".join(
+                    sse_event(f"{run.run_id}-{seq}", payload) for seq, payload in coalesce_events(numbered)
+                )
+        finally:
+            run.detach()
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/playlists/{playlist_id}/download-all-stream/cancel")
+def cancel_playlist_download(playlist_id: str):
+    with _download_runs_lock:
+        run = _download_runs.get(playlist_id)
+    if run is None or run.done:
+        return JSONResponse({"error": "No running download for this playlist"}, status_code=404)
+    run.cancel.set()
+    return {"cancelled": True}
+
+
+## -------------------SYNC ENDPOINTS-------------------------
+
+@app.on_event("startup")
+def auto_start_sync():
+    if SYNC_INTERVAL > 0:
+        start_background_sync(SYNC_INTERVAL)
+
+
+@app.on_event("shutdown")
+def shutdown_sync():
+    stop_background_sync()
+
+
+@app.post("/sync/start")
+def sync_start(interval: int = Query(900, ge=60, description="Seconds between library scans")):
+    if not background_spotify():
+        return JSONResponse({"error": "Not authenticated"}, status_code=401)
+    started = start_background_sync(interval)
+    return {"started": started, **sync_status_snapshot()}
+
+
+@app.post("/sync/stop")
+def sync_stop():
+    stop_background_sync()
+    return {"stopping": True, **sync_status_snapshot()}
+
+
+@app.get("/sync/status")
+def sync_status():
+    return sync_status_snapshot()
+
+
+## -------------------YOUTUBEDL POOL ENDPOINTS-------------------------
+
+@app.on_event("startup")
+def warm_ydl_pool():
+    # build the instances in the background so startup isn't delayed
+    get_io_pool().submit(ydl_pool.warm, "source", MAX_CONCURRENT_FETCHES)
 
-            except Exception as e:
-                print("Tagging block exception for", cleaned_filename, e)
 
-            # send update to client
-            yield f"data: {json.dumps(current_data)}\n\n"
-            time.sleep(0.2)  # slight delay for smoother frontend handling
+@app.on_event("shutdown")
+def close_ydl_pool():
+    ydl_pool.close_all()
 
-        print("✅ All tracks processed")
-        yield f"data: {json.dumps({'done': True})}\n\n"
 
-    return StreamingResponse(generate(), media_type="text/event-stream")
+@app.get("/debug/ydl-pool")
+def ydl_pool_stats():
+    # created vs reused shows how much per-track YoutubeDL setup the pool saves
+    stats = dict(ydl_pool.stats)
+    stats["avg_setup_seconds"] = round(stats["setup_seconds"] / stats["created"], 4) if stats["created"] else 0.0
+    return stats
@@ -30,6 +30,7 @@ export class HomeComponent implements OnInit {
 
   progress = {
     active: false,
+    playlistId: '',
     currentSong: '',
     currentIndex: 0,
     total: 0,
@@ -138,6 +139,7 @@ export class HomeComponent implements OnInit {
     if (!confirm(`Download all songs from "${playlist.name}"?`)) return;
 
     this.progress.active = true;
+    this.progress.playlistId = playlist.id;
     this.progress.currentSong = '';
     this.progress.currentIndex = 0;
     this.progress.total = 0;
@@ -150,6 +152,13 @@ export class HomeComponent implements OnInit {
     eventSource.onmessage = (event) => {
       const data = JSON.parse(event.data);
 
+      if (data.cancelled) {
+        this.progress.active = false;
+        this.cdr.detectChanges();
+        eventSource.close();
+        return;
+      }
+
       if (data.error) {
         alert(data.error);
         this.progress.active = false;
@@ -180,22 +189,45 @@ export class HomeComponent implements OnInit {
       }
 
       // ✅ Set progress bar values first
-      if (data.total && data.index) {
-        const percent = (data.index / data.total) * 100;
+      // tracks finish out of order now, so progress follows the completed count
+      const done = data.completed ?? data.index;
+      if (data.total && done) {
+        const percent = (done / data.total) * 100;
         this.progress.percent = isFinite(percent) ? Math.round(percent) : 0;
-        this.progress.currentIndex = data.index;
+        this.progress.currentIndex = done;
         this.progress.total = data.total;
         this.progress.currentSong = data.song; // ✅ safe now
       }
 
       this.cdr.detectChanges(); // ✅ Force UI update
-      console.log(`🎧 ${data.status.toUpperCase()}: ${data.song} (${data.duration}s)`);
+      if (data.coalesced) {
+        console.log(`🎧 ${data.coalesced} updates, latest ${data.status.toUpperCase()}: ${data.song}`);
+      } else {
+        console.log(`🎧 ${data.status.toUpperCase()}: ${data.song} (${data.duration}s)`);
+      }
     };
 
     eventSource.onerror = (err) => {
-      console.error('SSE error:', err);
-      this.progress.active = false;
-      eventSource.close();
+      // EventSource reconnects on its own and resumes via Last-Event-ID;
+      // only give up once the browser has closed the stream for good
+      if (eventSource.readyState === EventSource.CLOSED) {
+        console.error('SSE error:', err);
+        this.progress.active = false;
+        this.cdr.detectChanges();
+      } else {
+        console.warn('SSE connection lost, reconnecting...');
+      }
     };
   }
+
+  cancelDownload() {
+    if (!this.progress.playlistId) return;
+
+    // the stream then delivers a final { cancelled: true } event
+    this.http
+      .post(`http://localhost:8000/playlists/${this.progress.playlistId}/download-all-stream/cancel`, {})
+      .subscribe({
+        error: (err) => console.error('Failed to cancel download:', err),
+      });
+  }
 }